@@ -1,36 +1,21 @@
-import networkx as nx
-import matplotlib.pyplot as plt
-from collections import defaultdict
+from array import array
+from collections import defaultdict, deque
+import contextlib
+import functools
+import gc
 import re
+import sys
 
-class EarleyItem:
-    def __init__(self, rule, dot_pos, start_pos, end_pos=None):
-        self.rule = rule  # (left_side, right_side)
-        self.dot_pos = dot_pos
-        self.start_pos = start_pos
-        self.end_pos = end_pos
-        self.children = []  # Para construir el árbol
-        
-    def __str__(self):
-        left, right = self.rule
-        right_str = ' '.join(right[:self.dot_pos] + ['•'] + right[self.dot_pos:])
-        return f"{left} → {right_str} [{self.start_pos}, {self.end_pos}]"
-    
-    def __eq__(self, other):
-        return (self.rule == other.rule and 
-                self.dot_pos == other.dot_pos and 
-                self.start_pos == other.start_pos)
-    
-    def __hash__(self):
-        return hash((self.rule, self.dot_pos, self.start_pos))
-    
-    def is_complete(self):
-        return self.dot_pos >= len(self.rule[1])
-    
-    def next_symbol(self):
-        if self.is_complete():
-            return None
-        return self.rule[1][self.dot_pos]
+@contextlib.contextmanager
+def gc_paused():
+    # Desactiva temporalmente el recolector de ciclos de Python
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
 
 class EarleyParser:
     def __init__(self, grammar_file):
@@ -38,10 +23,48 @@ class EarleyParser:
         self.start_symbol = None
         self.terminals = set()
         self.non_terminals = set()
+        self.nullable = set()
+        self.nullable_rule = {}  # Producción que deriva ε de cada anulable
+        # Producciones numeradas: rule_lhs[rid] -> rule_rhs[rid]
+        self.rule_lhs = []
+        self.rule_rhs = []
+        self.rule_len = []
+        self.rules_by_lhs = {}
+        self.predict_closure = {}
+        # Codificación entera de la gramática para los ciclos de Earley
+        self.symbols = []
+        self.sym_to_id = {}
+        self.is_nt = []
+        self.rule_lhs_id = []
+        self.rhs_flat = array('i')
+        self.rhs_off = array('i', [0])
+        self.closure_by_id = []
+        self.closure_nts_by_id = []
+        self.nullable_rule_by_id = []
+        # Filtro previo: terminales alcanzables y pares de tokens consecutivos
+        self.first = {}
+        self.last = {}
+        self.reachable_terminals = set()
+        self.allowed_next = {}
+        # Tablas SLR(1) si la gramática es determinista (si no, se usa Earley)
+        self.slr_action = None
+        self.slr_goto = None
         self.analyze_grammar()
         
+        # Tokenizador compilado: número | identificador | operador | espacios
+        self._tok_re = re.compile(r'(\d+)|([^\W\d_]\w*)|([+\-*/()])|\s+')
+        self._op_tokens = {'+': sys.intern('op_suma'), '-': sys.intern('op_suma'),  # Tratar - como op_suma
+                           '*': sys.intern('op_mul'), '/': sys.intern('op_mul'),    # Tratar / como op_mul
+                           '(': sys.intern('pari'), ')': sys.intern('pard')}
+        self._num_token = sys.intern('num')
+        self._id_token = sys.intern('id')
+        
+        # Caché LRU de resultados por secuencia de tokens (por instancia)
+        self._parse_snapshot = functools.lru_cache(maxsize=256)(self._parse_snapshot)
+        
     def load_grammar(self, filename):
         grammar = defaultdict(list)
+        rhs_cache = {}  # Partes derechas idénticas comparten una sola tupla
         try:
             with open(filename, 'r', encoding='utf-8') as f:
                 for line in f:
@@ -51,8 +74,10 @@ class EarleyParser:
                     
                     if '->' in line:  # Permitir también ->
                         left, right = line.split('->', 1)
-                        left = left.strip()
-                        right = right.strip().split()
+                        # Internar los símbolos: las comparaciones pasan a ser por identidad
+                        left = sys.intern(left.strip())
+                        right = tuple(sys.intern(symbol) for symbol in right.strip().split())
+                        right = rhs_cache.setdefault(right, right)
                         grammar[left].append(right)
         except FileNotFoundError:
             print(f"Error: No se encontró el archivo {filename}")
@@ -75,152 +100,554 @@ class EarleyParser:
                 for symbol in production:
                     if symbol not in self.non_terminals:
                         self.terminals.add(symbol)
+        
+        # Asignar un id entero estable a cada producción
+        for left, productions in self.grammar.items():
+            rule_ids = []
+            for production in productions:
+                rule_ids.append(len(self.rule_lhs))
+                self.rule_lhs.append(left)
+                self.rule_rhs.append(production)
+                self.rule_len.append(len(production))
+            self.rules_by_lhs[left] = rule_ids
+        
+        # No terminales que derivan la cadena vacía (punto fijo)
+        changed = True
+        while changed:
+            changed = False
+            for left, rule_ids in self.rules_by_lhs.items():
+                if left in self.nullable:
+                    continue
+                for rule_id in rule_ids:
+                    if all(s in self.nullable for s in self.rule_rhs[rule_id]):
+                        self.nullable.add(left)
+                        self.nullable_rule[left] = rule_id
+                        changed = True
+                        break
+        
+        # Clausura de predicción: ids de todas las producciones alcanzables
+        # desde A prediciendo el primer símbolo (saltando los anulables)
+        for non_terminal in self.non_terminals:
+            closure = []
+            visited = {non_terminal}
+            queue = deque([non_terminal])
+            while queue:
+                current = queue.popleft()
+                for rule_id in self.rules_by_lhs[current]:
+                    closure.append(rule_id)
+                    for symbol in self.rule_rhs[rule_id]:
+                        if symbol in self.non_terminals and symbol not in visited:
+                            visited.add(symbol)
+                            queue.append(symbol)
+                        if symbol not in self.nullable:
+                            break
+            self.predict_closure[non_terminal] = closure
+        
+        self.analyze_adjacency()
+        self._try_build_slr()
+        
+        # Símbolos como enteros densos: primero no terminales, luego terminales.
+        # La parte derecha de la producción rid es rhs_flat[rhs_off[rid]:rhs_off[rid + 1]]
+        for left, productions in self.grammar.items():
+            for symbol in (left,) + tuple(s for production in productions for s in production):
+                if symbol not in self.sym_to_id:
+                    self.sym_to_id[symbol] = len(self.symbols)
+                    self.symbols.append(symbol)
+        self.is_nt = [symbol in self.non_terminals for symbol in self.symbols]
+        for rule_id, left in enumerate(self.rule_lhs):
+            self.rule_lhs_id.append(self.sym_to_id[left])
+            self.rhs_flat.extend(self.sym_to_id[symbol] for symbol in self.rule_rhs[rule_id])
+            self.rhs_off.append(len(self.rhs_flat))
+        self.closure_by_id = [self.predict_closure.get(symbol, []) for symbol in self.symbols]
+        self.nullable_rule_by_id = [self.nullable_rule.get(symbol, -1) for symbol in self.symbols]
+        # No terminales cubiertos por cada clausura: tras predecir A ya están
+        # predichos todos ellos en esa columna
+        self.closure_nts_by_id = [frozenset(self.rule_lhs_id[rule_id] for rule_id in closure)
+                                  for closure in self.closure_by_id]
+    
+    def analyze_adjacency(self):
+        # FIRST/LAST: terminales con que puede empezar/terminar cada no terminal
+        self.first = {non_terminal: set() for non_terminal in self.non_terminals}
+        self.last = {non_terminal: set() for non_terminal in self.non_terminals}
+        changed = True
+        while changed:
+            changed = False
+            for left, production in zip(self.rule_lhs, self.rule_rhs):
+                for edge, symbols in ((self.first, production), (self.last, reversed(production))):
+                    for symbol in symbols:
+                        new = self.edge_terminals(edge, symbol) - edge[left]
+                        if new:
+                            edge[left] |= new
+                            changed = True
+                        if symbol not in self.nullable:
+                            break
+        
+        # Terminales alcanzables desde el símbolo de inicio
+        visited = {self.start_symbol}
+        queue = deque([self.start_symbol])
+        while queue:
+            for production in self.grammar[queue.popleft()]:
+                for symbol in production:
+                    if symbol not in self.non_terminals:
+                        self.reachable_terminals.add(symbol)
+                    elif symbol not in visited:
+                        visited.add(symbol)
+                        queue.append(symbol)
+        
+        # t1 puede ir seguido de t2 si en alguna producción A → ... X Y ... (con
+        # solo anulables entre X e Y) t1 está en LAST(X) y t2 en FIRST(Y)
+        self.allowed_next = {terminal: set() for terminal in self.terminals}
+        for production in self.rule_rhs:
+            for i, symbol in enumerate(production):
+                before = self.edge_terminals(self.last, symbol)
+                for following in production[i + 1:]:
+                    after = self.edge_terminals(self.first, following)
+                    for terminal in before:
+                        self.allowed_next[terminal] |= after
+                    if following not in self.nullable:
+                        break
+    
+    def edge_terminals(self, edge, symbol):
+        if symbol in self.non_terminals:
+            return edge[symbol]
+        return {symbol}
+    
+    def _try_build_slr(self):
+        # FOLLOW: terminales que pueden seguir a cada no terminal
+        # (None marca el fin de la entrada)
+        follow = {non_terminal: set() for non_terminal in self.non_terminals}
+        follow[self.start_symbol].add(None)
+        changed = True
+        while changed:
+            changed = False
+            for left, production in zip(self.rule_lhs, self.rule_rhs):
+                for i, symbol in enumerate(production):
+                    if symbol not in self.non_terminals:
+                        continue
+                    new = set()
+                    for following in production[i + 1:]:
+                        new |= self.edge_terminals(self.first, following)
+                        if following not in self.nullable:
+                            break
+                    else:
+                        new |= follow[left]
+                    if not new <= follow[symbol]:
+                        follow[symbol] |= new
+                        changed = True
+        
+        # Colección canónica LR(0) con la producción aumentada S' → S
+        accept_rule = len(self.rule_rhs)
+        rule_rhs = self.rule_rhs + [(self.start_symbol,)]
+        
+        def closure(kernel):
+            items = set(kernel)
+            queue = list(kernel)
+            while queue:
+                rule_id, dot_pos = queue.pop()
+                production = rule_rhs[rule_id]
+                if dot_pos < len(production) and production[dot_pos] in self.non_terminals:
+                    for new_rule in self.rules_by_lhs[production[dot_pos]]:
+                        if (new_rule, 0) not in items:
+                            items.add((new_rule, 0))
+                            queue.append((new_rule, 0))
+            return items
+        
+        def add_action(table, terminal, entry):
+            # Dos acciones para el mismo terminal: la gramática no es SLR(1)
+            if terminal in table:
+                return False
+            table[terminal] = entry
+            return True
+        
+        kernels = [frozenset([(accept_rule, 0)])]
+        states = {kernels[0]: 0}
+        action = []
+        goto = []
+        while len(action) < len(kernels):
+            state_action = {}
+            state_goto = {}
+            transitions = defaultdict(set)
+            for rule_id, dot_pos in closure(kernels[len(action)]):
+                production = rule_rhs[rule_id]
+                if dot_pos < len(production):
+                    transitions[production[dot_pos]].add((rule_id, dot_pos + 1))
+                elif rule_id == accept_rule:
+                    if not add_action(state_action, None, ('accept', None)):
+                        return
+                else:
+                    for terminal in follow[self.rule_lhs[rule_id]]:
+                        if not add_action(state_action, terminal, ('reduce', rule_id)):
+                            return
+            
+            for symbol, kernel in transitions.items():
+                kernel = frozenset(kernel)
+                if kernel not in states:
+                    states[kernel] = len(kernels)
+                    kernels.append(kernel)
+                if symbol in self.non_terminals:
+                    state_goto[symbol] = states[kernel]
+                elif not add_action(state_action, symbol, ('shift', states[kernel])):
+                    return
+            
+            action.append(state_action)
+            goto.append(state_goto)
+        
+        self.slr_action = action
+        self.slr_goto = goto
+    
+    def may_accept(self, token_types):
+        # Rechazo barato en O(n) antes de construir el chart: si falla, la
+        # gramática no puede generar la cadena; si pasa, decide Earley
+        if not token_types:
+            return True
+        if (token_types[0] not in self.first[self.start_symbol] or
+                token_types[-1] not in self.last[self.start_symbol]):
+            return False
+        for token_type in token_types:
+            if token_type not in self.reachable_terminals:
+                return False
+        for current, following in zip(token_types, token_types[1:]):
+            if following not in self.allowed_next[current]:
+                return False
+        return True
     
     def tokenize(self, input_string):
-        # Tokenizador  maneja operadores y números
+        # Tokenizador  maneja operadores y números (una sola pasada del regex)
         tokens = []
-        i = 0
-        while i < len(input_string):
-            char = input_string[i]
-            if char.isspace():
-                i += 1
+        for match in self._tok_re.finditer(input_string):
+            kind = match.lastindex
+            if kind is None:  # Espacios
                 continue
-            elif char.isdigit():
-                # Leer número completo
-                num = ''
-                while i < len(input_string) and input_string[i].isdigit():
-                    num += input_string[i]
-                    i += 1
-                tokens.append(('num', num))
-            elif char in '+-*/()':
-                # Mapear operadores a tokens de la gramática
-                if char == '+':
-                    tokens.append(('op_suma', char))
-                elif char == '*':
-                    tokens.append(('op_mul', char))
-                elif char == '(':
-                    tokens.append(('pari', char))
-                elif char == ')':
-                    tokens.append(('pard', char))
-                elif char == '-':
-                    tokens.append(('op_suma', char))  # Tratar - como op_suma
-                elif char == '/':
-                    tokens.append(('op_mul', char))   # Tratar / como op_mul
-                i += 1
-            elif char.isalpha():
-                # Leer identificador
-                ident = ''
-                while i < len(input_string) and (input_string[i].isalnum() or input_string[i] == '_'):
-                    ident += input_string[i]
-                    i += 1
-                tokens.append(('id', ident))
+            value = match.group(kind)
+            if kind == 1:
+                tokens.append((self._num_token, value))
+            elif kind == 2:
+                tokens.append((self._id_token, value))
             else:
-                i += 1
+                # Mapear operadores a tokens de la gramática
+                tokens.append((self._op_tokens[value], value))
         
         return tokens
     
+    def _parse_cached(self, tokens):
+        # El árbol es mutable: se guarda una copia en tuplas y se reconstruye
+        success, snapshot = self._parse_snapshot(tuple(tokens))
+        if snapshot is None:
+            return success, None
+        
+        parents, labels, types, children = snapshot
+        return success, (list(parents), list(labels), list(types),
+                         [list(node_children) for node_children in children])
+    
+    def _parse_snapshot(self, tokens):
+        success, tree = self._parse_tokens(tokens)
+        if tree is None:
+            return success, None
+        
+        parents, labels, types, children = tree
+        return success, (tuple(parents), tuple(labels), tuple(types),
+                         tuple(tuple(node_children) for node_children in children))
+    
     def parse(self, input_string):
-        tokens = self.tokenize(input_string)
+        return self._parse_tokens(self.tokenize(input_string))
+    
+    def _parse_tokens(self, tokens):
         token_types = [token[0] for token in tokens]
         
-        if not self.start_symbol:
+        if not self.start_symbol or not self.may_accept(token_types):
             return False, None
         
-        # Inicializar chart
+        # Gramática determinista: análisis desplazamiento-reducción sin chart
+        if self.slr_action is not None:
+            return self._fast_parse(tokens, token_types)
+        
+        # Nombres locales: evitan búsquedas de atributos en los ciclos internos
+        rule_lhs = self.rule_lhs
+        rule_len = self.rule_len
+        rhs_flat = self.rhs_flat
+        rhs_off = self.rhs_off
+        is_nt = self.is_nt
+        closure_by_id = self.closure_by_id
+        closure_nts_by_id = self.closure_nts_by_id
+        add_item = self.add_item
+        complete = self.complete
+        scan = self.scan
+        n_tokens = len(token_types)
+        # Tipos de token como ids de símbolo (-1 si la gramática no lo usa)
+        tok_ids = array('i', [self.sym_to_id.get(token_type, -1) for token_type in token_types])
+        tok_ids.append(-1)
+        
+        # Inicializar chart; cada item es una tupla (rule_id, punto, inicio)
         chart = [[] for _ in range(len(token_types) + 1)]
+        # Índice por columna para evitar búsquedas lineales en chart[pos]
+        chart_set = [set() for _ in range(len(token_types) + 1)]
+        # Items que esperan un no terminal: waiting[pos][no_terminal] -> items
+        self.waiting = [defaultdict(list) for _ in range(len(token_types) + 1)]
+        # Bosque compartido (SPPF): back[(item, fin)] -> [(item_previo, hijo)]
+        # donde hijo es el índice de un token o un (item_completo, fin)
+        self.back = defaultdict(list)
+        # Items transitivos de Leo: leo[pos][no_terminal] -> item superior
+        self.leo = [{} for _ in range(len(token_types) + 1)]
+        # El item inicial completo nunca se omite (se necesita para aceptar)
+        self.leo[0][self.sym_to_id[self.start_symbol]] = None
         
         # Predicción inicial
-        for production in self.grammar.get(self.start_symbol, []):
-            item = EarleyItem((self.start_symbol, production), 0, 0)
-            chart[0].append(item)
-        
-        # Procesar cada posición
-        for i in range(len(token_types) + 1):
-            j = 0
-            while j < len(chart[i]):
-                item = chart[i][j]
-                
-                if item.is_complete():
-                    # Completion
-                    self.complete(chart, item, i)
-                else:
-                    next_sym = item.next_symbol()
-                    if next_sym in self.non_terminals:
-                        # Prediction
-                        self.predict(chart, next_sym, i)
-                    elif i < len(token_types) and next_sym == token_types[i]:
-                        # Scan
-                        self.scan(chart, item, i, tokens[i])
-                
-                j += 1
+        for rule_id in self.rules_by_lhs.get(self.start_symbol, []):
+            item = (rule_id, 0, 0)
+            chart_set[0].add(item)
+            self.add_item(chart, chart_set, item, 0)
+        
+        # Procesar cada posición. Los items son tuplas acíclicas: se pausa el
+        # recolector de ciclos, que de otro modo recorrería el chart una y otra vez
+        with gc_paused():
+            for i in range(n_tokens + 1):
+                tok_id = tok_ids[i]
+                column = chart[i]  # Crece in situ mientras se recorre
+                seen = chart_set[i]
+                predicted = set()  # No terminales ya predichos en esta columna
+                j = 0
+                while j < len(column):
+                    item = column[j]
+                    rule_id, dot_pos, _ = item
+                    
+                    if dot_pos == rule_len[rule_id]:
+                        # Completion
+                        complete(chart, chart_set, item, i)
+                    else:
+                        next_sym = rhs_flat[rhs_off[rule_id] + dot_pos]
+                        if is_nt[next_sym]:
+                            # Prediction (clausura precalculada, una vez por columna)
+                            if next_sym not in predicted:
+                                predicted |= closure_nts_by_id[next_sym]
+                                for new_rule in closure_by_id[next_sym]:
+                                    new_item = (new_rule, 0, i)
+                                    if new_item not in seen:
+                                        seen.add(new_item)
+                                        add_item(chart, chart_set, new_item, i)
+                        elif next_sym == tok_id:
+                            # Scan
+                            scan(chart, chart_set, item, i)
+                    
+                    j += 1
         
         # Verificar si hay una derivación completa
-        for item in chart[len(token_types)]:
-            if (item.rule[0] == self.start_symbol and 
-                item.is_complete() and 
-                item.start_pos == 0):
-                return True, self.build_tree(chart, len(token_types), tokens)
+        for rule_id, dot_pos, start_pos in chart[n_tokens]:
+            if (rule_lhs[rule_id] == self.start_symbol and 
+                dot_pos == rule_len[rule_id] and 
+                start_pos == 0):
+                return True, self.build_tree(chart, n_tokens, tokens)
         
         return False, None
     
-    def predict(self, chart, non_terminal, pos):
-        for production in self.grammar.get(non_terminal, []):
-            new_item = EarleyItem((non_terminal, production), 0, pos)
-            if new_item not in chart[pos]:
-                chart[pos].append(new_item)
+    def _fast_parse(self, tokens, token_types):
+        action = self.slr_action
+        goto = self.slr_goto
+        rule_lhs = self.rule_lhs
+        rule_len = self.rule_len
+        n_tokens = len(token_types)
+        
+        # Pila de estados y pila de nodos: un nodo es el índice de un token
+        # o una tupla (rule_id, hijos)
+        states = [0]
+        nodes = []
+        i = 0
+        while True:
+            entry = action[states[-1]].get(token_types[i] if i < n_tokens else None)
+            if entry is None:
+                return False, None
+            
+            kind, target = entry
+            if kind == 'shift':
+                states.append(target)
+                nodes.append(i)
+                i += 1
+            elif kind == 'reduce':
+                size = rule_len[target]
+                children = nodes[len(nodes) - size:]
+                if size:
+                    del nodes[-size:]
+                    del states[-size:]
+                nodes.append((target, children))
+                states.append(goto[states[-1]][rule_lhs[target]])
+            else:
+                return True, self.tree_arrays(nodes[-1], tokens, lambda node: node)
     
-    def scan(self, chart, item, pos, token):
-        new_item = EarleyItem(item.rule, item.dot_pos + 1, item.start_pos, pos + 1)
-        new_item.children = item.children + [token]
-        chart[pos + 1].append(new_item)
+    def scan(self, chart, chart_set, item, pos):
+        rule_id, dot_pos, start_pos = item
+        new_item = (rule_id, dot_pos + 1, start_pos)
+        chart_set[pos + 1].add(new_item)
+        # Un hijo entero es el índice del token consumido
+        self.back[(new_item, pos + 1)].append((item, pos))
+        self.add_item(chart, chart_set, new_item, pos + 1)
     
-    def complete(self, chart, completed_item, pos):
-        for item in chart[completed_item.start_pos]:
-            if (not item.is_complete() and 
-                item.next_symbol() == completed_item.rule[0]):
-                new_item = EarleyItem(item.rule, item.dot_pos + 1, item.start_pos, pos)
-                new_item.children = item.children + [completed_item]
-                if new_item not in chart[pos]:
-                    chart[pos].append(new_item)
+    def complete(self, chart, chart_set, completed_item, pos):
+        seen = chart_set[pos]
+        start = completed_item[2]
+        left = self.rule_lhs_id[completed_item[0]]
+        
+        # Optimización de Leo: una cadena de reducciones deterministas se
+        # resuelve agregando solo el item superior de la cadena
+        if start < pos:
+            top_item = self.leo_item(start, left)
+            if top_item is not None:
+                self.back[(top_item, pos)].append(('leo', completed_item))
+                if top_item not in seen:
+                    seen.add(top_item)
+                    self.add_item(chart, chart_set, top_item, pos)
+                return
+        
+        # Solo los items que esperan el no terminal completado
+        for item in self.waiting[start].get(left, ()):
+            new_item = (item[0], item[1] + 1, item[2])
+            # Las derivaciones alternativas solo agregan un puntero más
+            self.back[(new_item, pos)].append((item, (completed_item, pos)))
+            if new_item in seen:
+                continue
+            seen.add(new_item)
+            self.add_item(chart, chart_set, new_item, pos)
+    
+    def leo_item(self, pos, symbol):
+        # Sigue la cadena mientras el símbolo tenga un único item esperándolo
+        # en la forma B → α • A; memoriza el item superior en cada eslabón
+        path = []
+        top_item = None
+        while True:
+            memo = self.leo[pos]
+            if symbol in memo:
+                top_item = memo[symbol] or top_item
+                break
+            waiters = self.waiting[pos].get(symbol, ())
+            if len(waiters) != 1 or waiters[0][1] + 1 != self.rule_len[waiters[0][0]]:
+                memo[symbol] = None
+                break
+            rule_id, dot_pos, start_pos = waiters[0]
+            memo[symbol] = None  # En progreso: corta ciclos
+            path.append((memo, symbol))
+            top_item = (rule_id, dot_pos + 1, start_pos)
+            pos, symbol = start_pos, self.rule_lhs_id[rule_id]
+        
+        for memo, symbol in path:
+            memo[symbol] = top_item
+        return top_item
+    
+    def expand_leo(self, top_item, completed_item, end_pos):
+        # Reconstruye los punteros de la cadena que Leo omitió
+        while True:
+            start = completed_item[2]
+            item = self.waiting[start][self.rule_lhs_id[completed_item[0]]][0]
+            new_item = (item[0], item[1] + 1, item[2])
+            pointer = (item, (completed_item, end_pos))
+            if new_item == top_item:
+                return pointer
+            if (new_item, end_pos) not in self.back:
+                self.back[(new_item, end_pos)].append(pointer)
+            completed_item = new_item
+    
+    def add_item(self, chart, chart_set, item, pos):
+        chart[pos].append(item)
+        rule_id, dot_pos, start_pos = item
+        if dot_pos < self.rule_len[rule_id]:
+            next_sym = self.rhs_flat[self.rhs_off[rule_id] + dot_pos]
+            if self.is_nt[next_sym]:
+                self.waiting[pos][next_sym].append(item)
+                
+                # Aycock–Horspool: si el símbolo es anulable se avanza el punto
+                # de una vez; el hijo (None, rule_id) es su derivación de ε
+                epsilon_rule = self.nullable_rule_by_id[next_sym]
+                if epsilon_rule >= 0:
+                    new_item = (rule_id, dot_pos + 1, start_pos)
+                    self.back[(new_item, pos)].append((item, (None, epsilon_rule)))
+                    if new_item not in chart_set[pos]:
+                        chart_set[pos].add(new_item)
+                        self.add_item(chart, chart_set, new_item, pos)
+    
+    def item_str(self, item, end_pos=None):
+        rule_id, dot_pos, start_pos = item
+        right = self.rule_rhs[rule_id]
+        right_str = ' '.join(right[:dot_pos] + ('•',) + right[dot_pos:])
+        return f"{self.rule_lhs[rule_id]} → {right_str} [{start_pos}, {end_pos}]"
     
     def build_tree(self, chart, final_pos, tokens):
         # Encontrar el item de inicio completo
         start_item = None
         for item in chart[final_pos]:
-            if (item.rule[0] == self.start_symbol and 
-                item.is_complete() and 
-                item.start_pos == 0):
+            rule_id, dot_pos, start_pos = item
+            if (self.rule_lhs[rule_id] == self.start_symbol and 
+                dot_pos == self.rule_len[rule_id] and 
+                start_pos == 0):
                 start_item = item
                 break
         
         if not start_item:
             return None
         
-        # Construir el grafo
-        G = nx.DiGraph()
-        node_id = [0]  # Para generar IDs únicos
+        def get_children(item, end_pos):
+            # Recorrer los punteros hacia atrás desde el punto final;
+            # se toma la primera derivación registrada de cada item
+            children = []
+            while item[1] > 0:
+                pointers = self.back[(item, end_pos)]
+                if pointers[0][0] == 'leo':
+                    pointers[0] = self.expand_leo(item, pointers[0][1], end_pos)
+                prev_item, child = pointers[0]
+                children.append(child)
+                if isinstance(child, int):
+                    end_pos = child
+                elif child[0] is not None:  # Un hijo ε no consume entrada
+                    end_pos = child[0][2]
+                item = prev_item
+            children.reverse()
+            return children
+        
+        def expand(ref):
+            item, end_pos = ref
+            if item is None:  # Subárbol ε: (None, producción anulable)
+                rule_id = end_pos
+                return rule_id, [(None, self.nullable_rule[symbol])
+                                 for symbol in self.rule_rhs[rule_id]]
+            return item[0], get_children(item, end_pos)
+        
+        return self.tree_arrays((start_item, final_pos), tokens, expand)
+    
+    def tree_arrays(self, root, tokens, expand):
+        # Construir el árbol como arreglos planos indexados por id de nodo
+        # (ids en preorden, la raíz es 0 y parents[0] == -1). Un hijo entero
+        # es un token; expand(ref) da (rule_id, hijos) de un no terminal
+        parents = []
+        labels = []
+        types = []
+        children = []
         
-        def add_node_to_graph(item, parent_id=None):
-            current_id = node_id[0]
-            node_id[0] += 1
+        # Pila explícita de (referencia, padre): sin límite de recursión
+        stack = [(root, -1)]
+        while stack:
+            child_ref, parent_id = stack.pop()
+            current_id = len(parents)
+            parents.append(parent_id)
+            children.append([])
+            if parent_id >= 0:
+                children[parent_id].append(current_id)
             
-            if isinstance(item, tuple):  # Es un token terminal
-                token_type, token_value = item
-                G.add_node(current_id, label=token_value, type='terminal')
-            else:  # Es un item no terminal
-                G.add_node(current_id, label=item.rule[0], type='non_terminal')
+            if isinstance(child_ref, int):  # Es un token terminal
+                token_type, token_value = tokens[child_ref]
+                labels.append(token_value)
+                types.append('terminal')
+            else:  # Es un no terminal
+                rule_id, node_children = expand(child_ref)
+                labels.append(self.rule_lhs[rule_id])
+                types.append('non_terminal')
                 
-                # Agregar hijos
-                for child in item.children:
-                    child_id = add_node_to_graph(child, current_id)
-                    G.add_edge(current_id, child_id)
-            
-            return current_id
+                # Agregar hijos (en orden inverso para sacarlos en orden)
+                for child in reversed(node_children):
+                    stack.append((child, current_id))
         
-        root_id = add_node_to_graph(start_item)
-        return G
+        return parents, labels, types, children
     
     def visualize_tree(self, tree):
+        # Importaciones diferidas: solo se pagan si se dibuja un árbol
+        import matplotlib.pyplot as plt
+        import networkx as nx
+        
         if not tree:
             print("No hay árbol para visualizar")
             return
@@ -230,20 +657,18 @@ class EarleyParser:
         # Usar layout jerárquico
         pos = self._hierarchical_layout(tree)
         
-        # Dibujar nodos
-        node_colors = []
-        node_labels = {}
+        # Convertir a grafo de networkx solo para dibujar
+        parents, labels, types, children = tree
+        G = nx.DiGraph()
+        G.add_nodes_from(range(len(parents)))
+        G.add_edges_from((parent, node) for node, parent in enumerate(parents) if parent >= 0)
         
-        for node_id in tree.nodes():
-            node_data = tree.nodes[node_id]
-            node_labels[node_id] = node_data['label']
-            
-            if node_data['type'] == 'terminal':
-                node_colors.append('lightblue')
-            else:
-                node_colors.append('lightcoral')
+        # Dibujar nodos
+        node_labels = dict(enumerate(labels))
+        node_colors = ['lightblue' if node_type == 'terminal' else 'lightcoral'
+                       for node_type in types]
         
-        nx.draw(tree, pos, 
+        nx.draw(G, pos, 
                 with_labels=True, 
                 labels=node_labels,
                 node_color=node_colors,
@@ -257,26 +682,19 @@ class EarleyParser:
         plt.tight_layout()
         plt.show()
     
-    def _hierarchical_layout(self, G):
+    def _hierarchical_layout(self, tree):
         """Crear un layout jerárquico para el árbol"""
         pos = {}
-        levels = {}
-        
-        # Encontrar el nivel de cada nodo
-        def assign_levels(node, level):
-            levels[node] = level
-            for child in G.successors(node):
-                assign_levels(child, level + 1)
-        
-        # Encontrar la raíz (nodo sin predecesores)
-        roots = [n for n in G.nodes() if G.in_degree(n) == 0]
-        if roots:
-            assign_levels(roots[0], 0)
+        parents = tree[0]
+        levels = [0] * len(parents)
         
-        # Agrupar nodos por nivel
+        # Encontrar el nivel de cada nodo (en preorden el padre va antes)
+        # y agrupar nodos por nivel en la misma pasada
         level_groups = defaultdict(list)
-        for node, level in levels.items():
-            level_groups[level].append(node)
+        for node, parent in enumerate(parents):
+            if parent >= 0:
+                levels[node] = levels[parent] + 1
+            level_groups[levels[node]].append(node)
         
         # Asignar posiciones
         for level, nodes in level_groups.items():
@@ -308,7 +726,7 @@ def main():
             print(f"Tokens: {tokens}")
             
             # Parsear
-            success, tree = parser.parse(input_string)
+            success, tree = parser._parse_cached(tokens)
             
             if success:
                 print("ACEPTA")                
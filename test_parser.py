@@ -0,0 +1,28 @@
+import os
+import tempfile
+import unittest
+
+from parser import EarleyParser
+
+class NullableGrammarTest(unittest.TestCase):
+    def parser_for(self, grammar_text):
+        fd, path = tempfile.mkstemp(suffix='.txt')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(grammar_text)
+        self.addCleanup(os.remove, path)
+        return EarleyParser(path)
+
+    def test_epsilon_item_before_waiting_item(self):
+        # No es SLR(1): pasa por Earley. La regla ε de A entra en la columna
+        # antes que el item S → S • A que la espera
+        parser = self.parser_for('S -> S A\nS -> B A\nA -> a a a\nA ->\nB ->\n')
+        self.assertIsNone(parser.slr_action)
+
+        success, tree = parser.parse('')
+        self.assertTrue(success)
+        parents, labels, types, children = tree
+        self.assertEqual(labels[0], 'S')
+        self.assertNotIn('terminal', types)
+
+if __name__ == '__main__':
+    unittest.main()